@@ -15,6 +15,9 @@ if __name__ == '__main__':
     p.add_argument('--batch_size', help='batch process sentences with parallelized stats computation. '
                                         'default: 5000',
                    type=int, default=5_000, required=False)
+    p.add_argument('--checkpoint_every', help='number of sentence batches to process between writes to cache. '
+                                              'default: 16',
+                   type=int, default=16, required=False)
     p.add_argument('--n_sentences', help='constrain total sentences to process to this number. default: inf',
                    type=int, default=float('inf'), required=False)
 
@@ -23,4 +26,4 @@ if __name__ == '__main__':
 
     with Corpus(args.path, cache_dir=args.cache_dir, cache_tag=args.tag, 
                 n_sentences=args.n_sentences) as coca:
-        coca.read(batch_size=args.batch_size)
+        coca.read(batch_size=args.batch_size, checkpoint_every=args.checkpoint_every)
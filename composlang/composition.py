@@ -1,31 +1,156 @@
 
+import math
 import typing
 from composlang.corpus import Corpus
 import pandas as pd
-from functools import partial
-from collections import defaultdict, Counter#, OrderedDict
-from tqdm.auto import tqdm
+from collections import Counter#, OrderedDict
+from functools import lru_cache
 from composlang.utils import log, pathify
 import numpy as np
 
-# def entropy_np(pk: np.typing.ArrayLike,
-#                base: typing.Optional[float] = 2,
-#                axis: int = 0):
-#     pk_norm = pk / pk.sum(axis=axis)
-#     base = np.e if base is None else base
-#     return -(pk_norm * np.log(pk_norm) / np.log(base)).sum(axis=axis)
+try:
+    from numba import njit, prange
+except ImportError: # numba is optional; `sparse_entropy` falls back to numpy
+    njit, prange = None, range
+
+# below this many stored values, host<->device transfers outweigh the speedup
+GPU_MIN_NNZ = 1 << 22
+
+
+@lru_cache(maxsize=None)
+def _get_cupy():
+    '''
+    returns the `cupy` module if it is installed and a CUDA device is available,
+    else None
+    '''
+    try:
+        import cupy
+        if cupy.cuda.runtime.getDeviceCount() > 0:
+            return cupy
+    except Exception:
+        pass
+    return None
+
+
+def _segment_entropy(indptr: np.ndarray, data: np.ndarray) -> np.ndarray:
+    '''
+    entropy (in nats) of each row `data[indptr[i]:indptr[i+1]]` of a CSR matrix.
+    rows are independent, so they are spread over threads when compiled with numba
+    '''
+    n = len(indptr) - 1
+    ent = np.zeros(n)
+    for i in prange(n):
+        total = 0.0
+        for k in range(indptr[i], indptr[i+1]):
+            total += data[k]
+        if total > 0:
+            inv = 1.0 / total
+            e = 0.0
+            for k in range(indptr[i], indptr[i+1]):
+                if data[k] > 0:
+                    p = data[k] * inv
+                    e -= p * math.log(p)
+            ent[i] = e
+    return ent
+
+
+def _scatter_entropy(indices: np.ndarray, data: np.ndarray, n: int) -> np.ndarray:
+    '''
+    entropy (in nats) of each column of a CSR matrix, accumulated in two sequential 
+    passes over its stored values. unlike converting to CSC first, this never copies
+    or reorders the matrix
+    '''
+    totals = np.zeros(n)
+    for k in range(len(data)):
+        totals[indices[k]] += data[k]
+    ent = np.zeros(n)
+    for k in range(len(data)):
+        if data[k] > 0:
+            p = data[k] / totals[indices[k]]
+            ent[indices[k]] -= p * math.log(p)
+    return ent
+
+if njit is not None:
+    _segment_entropy = njit(parallel=True, cache=True)(_segment_entropy)
+    _scatter_entropy = njit(cache=True)(_scatter_entropy)
+
+
+def _bincount_entropy(segment: np.ndarray, data: np.ndarray, n: int, xp=np) -> np.ndarray:
+    '''
+    entropy (in nats) of each of `n` groups of stored values, where `segment` holds
+    the group (row or column) of each value in `data`, as two weighted bincounts. 
+    `xp` is either numpy or cupy
+    '''
+    if xp is np:
+        from scipy.special import xlogy
+    else:
+        from cupyx.scipy.special import xlogy
+        segment, data = xp.asarray(segment), xp.asarray(data)
+
+    # bincount accumulates in float64 regardless of the matrix dtype (but with no weights at
+    # all, i.e. no stored values, it returns int64 zeros)
+    totals = xp.bincount(segment, weights=data, minlength=n)
+    # one reciprocal per row/column rather than one division per stored value.
+    # a zero total means all of its stored values are zero, so any finite divisor works
+    p = data * (1 / xp.where(totals > 0, totals, 1))[segment]
+    # xlogy(0, 0) == 0, so explicitly stored zeros contribute nothing
+    ent = xp.bincount(segment, weights=-xlogy(p, p), minlength=n).astype(xp.float64, copy=False)
+
+    return ent if xp is np else ent.get()
+
+
+def sparse_entropy(matrix: 'scipy.sparse.spmatrix',
+                   axis: int = 0,
+                   base: typing.Optional[float] = None) -> np.ndarray:
+    """Computes the entropy of each column (axis=0) or row (axis=1) of a sparse
+        matrix of counts, touching only its stored (nonzero) entries. Behaves like
+        `scipy.stats.entropy(matrix.toarray(), axis=axis)`, except that empty
+        rows/columns get an entropy of 0 rather than nan.
+        Large matrices are reduced on the GPU if `cupy` and a CUDA device are available,
+        others with numba kernels if `numba` is installed.
+
+    Args:
+        matrix (scipy.sparse.spmatrix): non-negative (unnormalized) counts
+        axis (int, optional): axis along which to compute entropy. Defaults to 0.
+        base (float, optional): logarithmic base to use. Defaults to e.
+
+    Returns:
+        np.ndarray: entropy of each column (axis=0) or row (axis=1)
+    """
+    # both axes are reduced straight from CSR: columns by scattering over the column 
+    # index of each stored value, which avoids a transposed (CSC) copy of the matrix
+    m = matrix.tocsr()
+    n = m.shape[1 - axis]
+
+    gpu = m.nnz >= GPU_MIN_NNZ and _get_cupy() is not None
+    if njit is not None and not gpu:
+        if axis == 1:
+            ent = _segment_entropy(m.indptr, m.data)
+        else:
+            ent = _scatter_entropy(m.indices, m.data, n)
+    else:
+        # the row (or column) each stored value belongs to
+        if axis == 1:
+            segment = np.repeat(np.arange(n), np.diff(m.indptr))
+        else:
+            segment = m.indices
+        ent = _bincount_entropy(segment, m.data, n, xp=_get_cupy() if gpu else np)
+
+    if base is not None:
+        ent /= np.log(base)
+    return ent
 
 
 class CompositionAnalysis:
 
-    matrix = None
-
     def __init__(self, corpus: Corpus = None,
                  child_upos: str = 'ADJ', parent_upos: str = 'NOUN',
                  run_analyses = True):
         
         self.child_upos: str = child_upos
         self.parent_upos: str = parent_upos
+        # adjacency matrices, keyed by (skip, stat, dtype)
+        self._matrix_cache: dict = {}
 
         if corpus is not None:
             self._crunch_corpus_stats(corpus=corpus)
@@ -37,33 +162,60 @@ class CompositionAnalysis:
         child_upos = self.child_upos
         parent_upos = self.parent_upos
 
-        def filter_by_upos(dict_item: typing.Tuple[tuple, int], upos: str):
-            (t, u), ct = dict_item
-            return u == upos 
-
-        child_dicts = [dict(token=t, upos=u, freq=ct) 
-                       for (t,u), ct in filter(partial(filter_by_upos, upos=child_upos), corpus.token_stats.items())]
-        parent_dicts = [dict(token=t, upos=u, freq=ct) 
-                        for (t,u), ct in filter(partial(filter_by_upos, upos=parent_upos), corpus.token_stats.items())]
+        # one DataFrame over all tokens, sliced by UPOS below
+        token_stats = corpus.token_stats
+        all_df = pd.DataFrame(list(token_stats.keys()), columns=['token', 'upos'])
+        all_df['freq'] = np.fromiter(token_stats.values(), dtype=np.int64, count=len(token_stats))
 
-        self.n_tokens = sum(corpus.token_stats.values()) # stat needed for PMI
-        self.token_stats = {k: v for (k, kupos), v in corpus.token_stats.items() if kupos in (self.child_upos, self.parent_upos)}
+        self.n_tokens = int(all_df['freq'].sum()) # stat needed for PMI
+        # token -> freq for the two UPOS of interest, from the frame rather than another pass
+        # over corpus.token_stats (rows keep its order, so later duplicates still win)
+        relevant = all_df[all_df.upos.isin((child_upos, parent_upos))]
+        self.token_stats = dict(zip(relevant['token'].tolist(), relevant['freq'].tolist()))
         
         # make DataFrames to track various stats about each lexical item, separated by UPOS
-        self.child_df = pd.DataFrame(child_dicts).sort_values('freq', ascending=False, ignore_index=True)
-        self.parent_df = pd.DataFrame(parent_dicts).sort_values('freq', ascending=False, ignore_index=True)
+        self.child_df = all_df[all_df.upos == child_upos].sort_values('freq', ascending=False, ignore_index=True)
+        self.parent_df = all_df[all_df.upos == parent_upos].sort_values('freq', ascending=False, ignore_index=True)
 
         # pair-related stuff
-        self.pair_stats = Counter({(c,p): ct for ((c,cu), (p,pu)), ct in corpus.pair_stats.items() 
-                                   if cu == child_upos and pu == parent_upos})
-        self.pair_df = pd.DataFrame([dict(child=c, parent=p, pair=(c,p), freq=ct) 
-                                     for (c,p),ct in self.pair_stats.items()]).sort_values('freq', ascending=False, ignore_index=True)
-
-        self.skip_pair_stats = Counter({(c,p): ct for ((c,cu), (p,pu)), ct in corpus.skip_pair_stats.items() 
-                                        if cu == child_upos and pu == parent_upos})
-        self.skip_pair_df = pd.DataFrame([dict(child=c, parent=p, pair=(c,p), freq=ct) 
-                                          for (c,p),ct in self.skip_pair_stats.items()]).sort_values('freq', ascending=False, ignore_index=True)
-
+        def filter_pairs(pair_stats: typing.Mapping) -> dict:
+            # (child, parent) -> count, for pairs of the UPOS of interest
+            pairs = {}
+            for ((c, cu), (p, pu)), ct in pair_stats.items():
+                if cu == child_upos and pu == parent_upos:
+                    pairs[c, p] = ct
+            return pairs
+
+        def pair_frame(pairs: dict) -> pd.DataFrame:
+            # build column by column rather than from one dict per row
+            keys = list(pairs.keys())
+            df = pd.DataFrame({'child': [c for c, p in keys], 
+                               'parent': [p for c, p in keys],
+                               'freq': np.fromiter(pairs.values(), dtype=np.int64, count=len(keys))})
+            return df.sort_values('freq', ascending=False, ignore_index=True)
+
+        self.pair_stats = filter_pairs(corpus.pair_stats)
+        self.pair_df = pair_frame(self.pair_stats)
+
+        self.skip_pair_stats = filter_pairs(corpus.skip_pair_stats)
+        self.skip_pair_df = pair_frame(self.skip_pair_stats)
+
+        self._categorize_pairs()
+        # any matrices cached so far were built from the previous frames
+        self._matrix_cache.clear()
+
+
+    def _categorize_pairs(self):
+        '''
+        casts the `child`/`parent` columns of the pair DataFrames to categoricals over the 
+        tokens of child_df/parent_df, in that order, so that their integer codes double as
+        row indices into child_df/parent_df (-1 for tokens absent from them)
+        '''
+        child_dtype = pd.CategoricalDtype(self.child_df['token'])
+        parent_dtype = pd.CategoricalDtype(self.parent_df['token'])
+        for df in (self.pair_df, self.skip_pair_df):
+            df['child'] = df['child'].astype(child_dtype)
+            df['parent'] = df['parent'].astype(parent_dtype)
 
 
     def run_analyses(self):
@@ -82,46 +234,63 @@ class CompositionAnalysis:
         directory = pathify(directory)
         directory.mkdir(parents=True, exist_ok=True)
         for attr in ['child_df', 'parent_df', 'pair_df', 'skip_pair_df']:
-            obj = pd.read_csv(directory / f'{attr}.csv', index_col=0, converters={'token' : str})
+            obj = pd.read_csv(directory / f'{attr}.csv', index_col=0, 
+                              converters={'token' : str, 'child': str, 'parent': str})
             setattr(self, attr, obj)
+        self._categorize_pairs()
+        self._matrix_cache.clear()
 
 
-    def generate_adjacency_matrix(self, skip=False, stat='freq'):
-        """Generates an adjacency matrix with shape (n_child_tokens, n_parent_tokens),
+    def generate_adjacency_matrix(self, skip=False, stat='freq', dtype=np.float32):
+        """Generates a sparse adjacency matrix with shape (n_child_tokens, n_parent_tokens),
             with the i,j element representing the count of child[i], parent[j] occurring
             together
 
+        Args:
+            skip (bool, optional): use skip-pair (grandparent) counts. Defaults to False.
+            stat (str, optional): column of the pair DataFrame to fill the matrix with, or one 
+                of 'prob' (joint probability of each pair) and 'logfreq' (log2 of the count), 
+                which are derived from the cached 'freq' matrix. Defaults to 'freq'.
+            dtype (np.dtype, optional): dtype of the stored values. float32 halves the
+                memory of the default float64; counts are exact up to 2**24. 
+                Defaults to np.float32.
+
         Returns:
-            np.ndarray: adjacency matrix
+            scipy.sparse.csr_matrix: adjacency matrix
         """
-        if self.matrix is not None:
-            return self.matrix
+        key = (bool(skip), stat, np.dtype(dtype))
+        if key in self._matrix_cache:
+            return self._matrix_cache[key]
+
+        if stat in ('prob', 'logfreq'):
+            # derive from the frequency matrix, which shares the same sparsity structure
+            freq = self.generate_adjacency_matrix(skip=skip, stat='freq', dtype=dtype)
+            matrix = freq.copy()
+            if stat == 'prob':
+                matrix.data /= freq.data.sum(dtype=np.float64)
+            else:
+                matrix.data = np.log2(matrix.data)
+            self._matrix_cache[key] = matrix
+            return matrix
+
+        from scipy.sparse import csr_matrix
 
-        child_tokens = self.child_df['token']
-        parent_tokens = self.parent_df['token'] 
-
-        child_to_ix = {token: ix for ix, token in enumerate(child_tokens)}
-        parent_to_ix = {token: ix for ix, token in enumerate(parent_tokens)}
-
-        # TODO: explore the possibility of using scipy.sparse
         # matrix[i, :] -> distribution over all parent tokens for ith child token 
         # matrix[:, i] -> distribution over all child tokens for ith parent token 
-        matrix = np.zeros((len(child_tokens), len(parent_tokens)))
+        df = self.skip_pair_df if skip else self.pair_df
+        # categorical codes index into child_df/parent_df (see `_categorize_pairs`)
+        rows = df['child'].cat.codes.to_numpy(np.intp)
+        cols = df['parent'].cat.codes.to_numpy(np.intp)
+        missing = (rows < 0) | (cols < 0)
+        if missing.any():
+            raise KeyError(f'{missing.sum()} pairs refer to tokens absent from child_df/parent_df')
+        values = df[stat].to_numpy(dtype)
 
-        it = self.skip_pair_df.iterrows() if skip else self.pair_df.iterrows()
-        total = len(self.skip_pair_df) if skip else len(self.pair_df)
-        for _, row in tqdm(it, total=total, desc='constructing adjacency matrix'):
-            # if cu == self.child_upos and pu == self.parent_upos:
-            c, p, value = row[['child', 'parent', stat]]
-            try:
-                cix = child_to_ix[c]
-                pix = parent_to_ix[p]
-            except KeyError:
-                print(c,p,value)
-            matrix[cix, pix] = value
+        matrix = csr_matrix((values, (rows, cols)), 
+                            shape=(len(self.child_df), len(self.parent_df)), dtype=dtype)
 
-        self.matrix = matrix
-        return self.matrix
+        self._matrix_cache[key] = matrix
+        return matrix
 
 
     def compute_combinations(self) -> None: 
@@ -132,29 +301,27 @@ class CompositionAnalysis:
             occurrences as 1
         """
 
-        for key, stat_dict in (('combinations', self.pair_stats), 
-                               ('skip_combinations', self.skip_pair_stats)):
+        def count(codes: np.ndarray, weights: typing.Optional[np.ndarray], n: int) -> np.ndarray:
+            # codes index into child_df/parent_df (see `_categorize_pairs`); -1 is skipped
+            valid = codes >= 0
+            counts = np.bincount(codes[valid], weights=None if weights is None else weights[valid], 
+                                 minlength=n)
+            return counts.astype(np.int64)
+
+        for key, stat_df in (('combinations', self.pair_df), 
+                             ('skip_combinations', self.skip_pair_df)):
             if key in self.child_df and key in self.parent_df:
                 continue 
 
-            child_to_parent = defaultdict(int)
-            collapsed_child_to_parent = defaultdict(int)
-            parent_to_child = defaultdict(int)
-            collapsed_parent_to_child = defaultdict(int)
-
-            for (w, p), ct in tqdm(stat_dict.items(), desc=f'counting {key}'):
-                # if (child_upos == '*' or wupos == child_upos) and (parent_upos == '*' or pupos == parent_upos):
-                # if wupos == child_upos and pupos == parent_upos:
-                child_to_parent[w] += ct
-                collapsed_child_to_parent[w] += 1
-                parent_to_child[p] += ct
-                collapsed_parent_to_child[p] += 1
+            child_codes = stat_df['child'].cat.codes.to_numpy(np.intp)
+            parent_codes = stat_df['parent'].cat.codes.to_numpy(np.intp)
+            freqs = stat_df['freq'].to_numpy()
 
-            self.child_df[key] = [child_to_parent[k] for k in self.child_df['token']]
-            self.parent_df[key] = [parent_to_child[k] for k in self.parent_df['token']]
+            self.child_df[key] = count(child_codes, freqs, len(self.child_df))
+            self.parent_df[key] = count(parent_codes, freqs, len(self.parent_df))
 
-            self.child_df[f'{key}_collapsed'] = [collapsed_child_to_parent[k] for k in self.child_df['token']]
-            self.parent_df[f'{key}_collapsed'] = [collapsed_parent_to_child[k] for k in self.parent_df['token']]
+            self.child_df[f'{key}_collapsed'] = count(child_codes, None, len(self.child_df))
+            self.parent_df[f'{key}_collapsed'] = count(parent_codes, None, len(self.parent_df))
 
     
     def compute_entropy(self):
@@ -169,13 +336,11 @@ class CompositionAnalysis:
             if column_name in self.child_df and column_name in self.parent_df:
                 return 
 
-            from scipy.stats import entropy
-
             matrix = self.generate_adjacency_matrix(skip=skip)
             log(f'computing {column_name} for {self.child_upos}')
-            child_ent = entropy(matrix, axis=1)
+            child_ent = sparse_entropy(matrix, axis=1)
             log(f'computing {column_name} for {self.parent_upos}')
-            parent_ent = entropy(matrix, axis=0)
+            parent_ent = sparse_entropy(matrix, axis=0)
 
             self.child_df[column_name] = child_ent
             self.parent_df[column_name] = parent_ent
@@ -197,22 +362,23 @@ class CompositionAnalysis:
     def compute_pmi(self):
         '''
         '''
+        # each token's count takes part in many pairs, so take its log only once
+        log_token_stats = {t: math.log2(ct) for t, ct in self.token_stats.items()}
+        log_n_tokens = math.log2(self.n_tokens)
+
         # we will have a PMI value per pair
         for key, stat_df in (('pmi', self.pair_df), 
                              ('skip_pmi', self.skip_pair_df)
                             ):
-            if key in self.child_df and key in self.parent_df:
+            if key in stat_df:
                 continue
 
-            pmi = []
-            for i, (w, p, (w, p), ct) in tqdm(stat_df.iterrows(), total=len(stat_df), desc=f'processing {key}'):
-                p_given_w_ct = np.log2(ct) 
-                p_ct = np.log2(self.token_stats[p])
-                w_ct = np.log2(self.token_stats[w])
-                pmi_w_p = (p_given_w_ct - w_ct) - (p_ct - np.log2(self.n_tokens))
-                pmi += [pmi_w_p]
+            log_ct = np.log2(stat_df['freq'].to_numpy(dtype=np.float64))
+            log_w_ct = stat_df['child'].map(log_token_stats).to_numpy(dtype=np.float64)
+            log_p_ct = stat_df['parent'].map(log_token_stats).to_numpy(dtype=np.float64)
 
-            stat_df[key] = pmi
+            # log p(p|w) - log p(p)
+            stat_df[key] = (log_ct - log_w_ct) - (log_p_ct - log_n_tokens)
 
 
     def bipartite_layout(self):
@@ -231,11 +397,10 @@ class CompositionAnalysis:
 
     def generate_combinations(self, min_freq=2, n=100):
         
-        C = self.child_token_stats[self.child_token_stats.freq >= min_freq].token.sample(n)
-        P = self.parent_token_stats[self.parent_token_stats.freq >= min_freq].token.sample(n)
+        C = self.child_df[self.child_df.freq >= min_freq].token.sample(n)
+        P = self.parent_df[self.parent_df.freq >= min_freq].token.sample(n)
 
         samples = []
         for c, p in zip(C, P):
-            pair = (c, self.child_upos), (p, self.parent_upos)
-            samples.append(((c, p), self.pair_stats[pair]))
+            samples.append(((c, p), self.pair_stats.get((c, p), 0)))
         return samples
\ No newline at end of file
@@ -1,22 +1,75 @@
 # stdlib
-import fileinput
+import csv
+import math
+import os
 import time
 import typing
-from collections import Counter, defaultdict
+from collections import Counter
 from functools import cached_property, reduce
 from pathlib import Path
 
 # installed packages
+import joblib
 import numpy as np
-from joblib import Parallel, delayed
-from more_itertools import peekable
-from sqlitedict import SqliteDict
+import pandas as pd
 from tqdm.auto import tqdm
+try:
+    import lz4 # lets joblib compress the cache several times faster than zlib does
+    _CACHE_COMPRESSION = ('lz4', 3)
+except ImportError: # lz4 is optional
+    _CACHE_COMPRESSION = ('zlib', 1)
 
 # local module
 from composlang.graph import WordGraph
-from composlang.utils import iterable_from_directory_or_filelist, log, pathify
-from composlang.word import Word
+from composlang.utils import (content_size, count_lines, iterable_from_directory_or_filelist, log,
+                              open_binary, pathify, prefetch)
+from composlang.word import SentenceBatch, Word
+
+# caches written by earlier versions are SQLite databases rather than pickles
+_SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+def _count_keys(keys: np.ndarray) -> typing.Dict[int, int]:
+    '''
+    counts the occurrences of each distinct (packed) key with a single sort, in place of 
+    incrementing a dict once per key
+    '''
+    uniq, counts = np.unique(keys, return_counts=True)
+    return dict(zip(uniq.tolist(), counts.tolist()))
+
+
+def _add_counts(stats: typing.Dict[int, int], counts: typing.Mapping[int, int]):
+    '''
+    adds `counts` to the running `stats` in place
+    '''
+    get = stats.get
+    for key, ct in counts.items():
+        stats[key] = get(key, 0) + ct
+
+
+def _sentence_starts(sentence_ids: np.ndarray) -> np.ndarray:
+    '''
+    positions of the first token of each sentence, i.e., wherever the sentence_id changes
+    '''
+    return np.flatnonzero(np.r_[True, sentence_ids[1:] != sentence_ids[:-1]])
+
+
+def _digest_file(corpus: 'Corpus', path: Path, lines_to_skip: int, batch_size: int
+                 ) -> typing.Tuple[typing.List[Word], np.ndarray, Counter, Counter, dict, int, int]:
+    '''
+    reads and digests a single file of the corpus in a worker process. `corpus` is a fresh
+    copy of the reading `Corpus` (see `Corpus._worker_copy`), so the returned stats
+    (tokens and their counts, pairs, skip-pairs, triplets, sentences seen, lines read) 
+    cover just this file
+    '''
+    n_sentences, n_lines = 0, 0
+    for sb, sents_read, _ in corpus._iter_sentencebatches([(path, lines_to_skip)], batch_size):
+        corpus.digest_sentencebatch(sb)
+        n_sentences += sents_read
+        n_lines += len(sb.ids)
+
+    return (corpus._words, corpus._token_counts, corpus._pair_counts, corpus._skip_pair_counts, 
+            corpus._triplet_stats, n_sentences, n_lines)
 
 
 class Corpus:
@@ -42,8 +95,10 @@ class Corpus:
     _total = None
 
     # tracking the linguistic features of interest within the corpus
-    _token_stats = None # (token:str, upos:str) -> num_occ:int
-    _pair_stats = None # ((token1:str, upos1:str), (token2, upos2)) -> num_occ:int
+    _words = None # id -> (token:str, upos:str)
+    _token_counts = None # id -> num_occ:int
+    _pair_counts = None # child_id << 32 | parent_id -> num_occ:int
+    _skip_pair_counts = None # child_id << 32 | grandparent_id -> num_occ:int
     _triplet_stats = None # -> num_occ:int
     # in a child-parent relation in a dependency parse
     cache = None
@@ -62,6 +117,7 @@ class Corpus:
                  ):
         ''' '''
         self._fmt = fmt
+        self._schema = self._compile_fmt(fmt)
         self._sep = sep
         self._lower = lowercase
         self._files = sorted(iterable_from_directory_or_filelist(directory_or_filelist))
@@ -69,18 +125,40 @@ class Corpus:
             log(f'could not find files at {directory_or_filelist}')
             # raise ValueError(f'could not find files at {directory_or_filelist}')
 
-        self._token_stats = Counter() # token -> num_occurrences
-        self._pair_stats = Counter() # (token, token) -> num_occurrences
-        self._skip_pair_stats = Counter() # (token, token) -> num_occurrences
-        self._triplet_stats = {'obj': Counter(), 'nsubj': Counter()} # -> num_occurrences
+        self._init_stats()
 
-        # loads the pre-existing _pair_stats and _token_stats objects, or creates empty ones
+        # loads the pre-existing _pair_counts and _token_counts objects, or creates empty ones
         self._cache_dir = cache_dir
         self._cache_tag = cache_tag
         self.cache = self._get_cache()
         self.load_cache()
-        self._n_sentences = n_sentences or float('inf') # upper limit for no. of sentences to process
+        # upper limit for no. of sentences to process; a whole number even if given as, e.g., 1e3
+        self._n_sentences = (int(n_sentences) if n_sentences and not math.isinf(n_sentences)
+                             else float('inf'))
+
+
+    def _init_stats(self):
+        # integer ids of the tokens seen so far, used to count tokens and edges in bulk
+        self._vocab = {} # token -> id
+        self._words = [] # id -> token
+        self._token_counts = np.zeros(0, dtype=np.int64) # id -> num_occurrences
+        # edges are keyed by the ids of their tokens packed into one int, which hashes much 
+        # faster, and takes far less memory, than a pair of tuples of strings
+        self._pair_counts = {} # child_id << 32 | parent_id -> num_occurrences
+        self._skip_pair_counts = {} # child_id << 32 | grandparent_id -> num_occurrences
+        self._triplet_stats = {'obj': Counter(), 'nsubj': Counter()} # -> num_occurrences
+        # line counts of the corpus files, to find where to resume without rescanning them
+        self._line_counts = {} # path -> (mtime_ns, size, num_lines)
 
+    def _worker_copy(self) -> 'Corpus':
+        '''
+        a copy of this object's reading configuration with empty stats and no cache,
+        to be sent to a worker process
+        '''
+        c = object.__new__(type(self))
+        c._fmt, c._schema, c._sep, c._lower = self._fmt, self._schema, self._sep, self._lower
+        c._init_stats()
+        return c
 
     @classmethod
     def from_cache(cls, cache_file: typing.Union[str, Path], 
@@ -88,7 +166,10 @@ class Corpus:
         path = pathify(cache_file)
         cache_dir = path.parent
         cache_tag = path.parts[-1]
-        return cls('/dev/null', cache_dir, cache_tag, n_sentences, fmt, sep, lowercase)
+        # only override the defaults of `__init__` for arguments that were supplied
+        kws = {k: v for k, v in dict(n_sentences=n_sentences, fmt=fmt, sep=sep, lowercase=lowercase).items() 
+               if v is not None}
+        return cls('/dev/null', cache_dir, cache_tag, **kws)
 
 
     def __len__(self) -> int:
@@ -99,10 +180,10 @@ class Corpus:
         return self # nothing to do here
 
     def __exit__(self, *args, **kws):
-        self._close_cache()
+        pass # nothing to close; the cache is written in full by each `to_cache`
 
     def __repr__(self) -> str:
-        s = f'<{self.__class__.__name__}; sentences_seen={self._sentences_seen:,}; tokens={len(self.token_stats):,}>'
+        s = f'<{self.__class__.__name__}; sentences_seen={self._sentences_seen:,}; tokens={len(self._words):,}>'
         return s
 
     ################################################################ 
@@ -110,14 +191,14 @@ class Corpus:
     ################################################################
 
     @property
-    def token_stats(self):
-        return self._token_stats
+    def token_stats(self) -> Counter:
+        return Counter(dict(zip(self._words, self._token_counts.tolist())))
     @property
-    def pair_stats(self):
-        return self._pair_stats
+    def pair_stats(self) -> Counter:
+        return self._decode_pairs(self._pair_counts)
     @property
-    def skip_pair_stats(self):
-        return self._skip_pair_stats
+    def skip_pair_stats(self) -> Counter:
+        return self._decode_pairs(self._skip_pair_counts)
     @property
     def triplet_stats(self):
         return self._triplet_stats
@@ -137,31 +218,41 @@ class Corpus:
             typing.Mapping: a (UPOS -> count) object
         """
         if group_by_token:
-            return Counter(upos for token, upos in self._token_stats)
+            return Counter(upos for token, upos in self._words)
 
-        # not grouping, so we want to consider each occurrence of each token
-        d = defaultdict(int)
-        for (token, upos), ct in self._token_stats.items():
-            token
+        # not grouping, so we want to consider each occurrence of each token.
+        # a Counter (unlike a defaultdict) does not grow when queried for an absent upos
+        d = Counter()
+        for (token, upos), ct in zip(self._words, self._token_counts.tolist()):
             d[upos] += ct
         return d
 
+    def iter_pair_counts(self, child_upos: str = '*', 
+                         parent_upos: str = '*') -> typing.Iterator[typing.Tuple[Word, Word, int]]:
+        """iterates over distinct (child, parent) pairs along with their number of occurrences,
+            rather than re-emitting a pair once per occurrence.
+
+        Args:
+            child_upos (str, optional): upos of the child in a pair, or '*' for any. Defaults to '*'.
+            parent_upos (str, optional): upos of the parent in a pair, or '*' for any. Defaults to '*'.
+
+        Yields:
+            typing.Tuple[Word, Word, int]: child, parent, and the count of the pair
+        """
+        words = self._words
+        for key, ct in self._pair_counts.items():
+            w, p = words[key >> 32], words[key & 0xFFFFFFFF]
+            if (child_upos == '*' or w[1] == child_upos) and (parent_upos == '*' or p[1] == parent_upos):
+                yield w, p, ct
+
 
     ################################################################ 
     #### caching behavior
     ################################################################ 
 
-    def _close_cache(self):
-        try:
-            self.cache.commit()
-            self.cache.close()
-        except Exception as e:
-            log(f'encountered error in closing cache: {e}')
-            pass
-
-    def _get_cache(self, prefix=None, tag=None):
+    def _get_cache(self, prefix=None, tag=None) -> Path:
         '''
-        creates and returns an SqliteDict() object
+        returns the path of the file that this instance's state is cached to
         '''
         tag = tag or self._cache_tag
         if tag is None:
@@ -173,48 +264,87 @@ class Corpus:
         root = Path(prefix or self._cache_dir).expanduser().resolve()
         root.mkdir(parents=True, exist_ok=True)
         root /= tag
-        return SqliteDict(str(root), flag='c')
+        return root
+
+    def _read_cache(self) -> dict:
+        '''
+        reads the state stored in the cache file, if any, as an (attribute -> value) dict
+        '''
+        if not self.cache.exists():
+            return {}
+        with self.cache.open('rb') as f:
+            header = f.read(len(_SQLITE_HEADER))
+        if header == _SQLITE_HEADER:
+            from sqlitedict import SqliteDict
+            with SqliteDict(str(self.cache), flag='r') as db:
+                return dict(db.items())
+        return joblib.load(self.cache)
 
     _attrs_to_cache = (('_sentences_seen', int), ('_lines_read', int),
                       ('_current_file', lambda: None), 
 
-                      ('_token_stats', Counter), 
-                      ('_pair_stats', Counter),
-                      ('_skip_pair_stats', Counter),
+                      ('_words', list),
+                      ('_token_counts', lambda: np.zeros(0, dtype=np.int64)),
+                      ('_pair_counts', dict),
+                      ('_skip_pair_counts', dict),
                       ('_triplet_stats', dict), 
 
                       ('_files', lambda: None), ('_total', lambda: None), 
+                      ('_line_counts', dict),
                       ('_n_sentences', lambda: None))
 
+    # the pair counts make up most of the state, and are cached as (keys, counts) arrays 
+    # since pickling large dicts element by element is much slower than dumping arrays
+    _attrs_cached_as_arrays = ('_pair_counts', '_skip_pair_counts')
+
     def load_cache(self, allow_empty=True):
         '''
         recover core data of this instance from cache 
         '''
         log(f'attempt loading from cache at {self._cache_dir}/{self._cache_tag}')
         start = time.process_time()
+        state = self._read_cache()
         for attr, default in tqdm(self._attrs_to_cache, desc='loading key-value pairs from cache'):
             print(f'{attr}', end=' ')
             try:
-                obj = self.cache[attr]
+                obj = state[attr]
                 setattr(self, attr, obj)
             except KeyError as e:
                 log(f'could not find attribute {attr} in cache')
                 if not allow_empty:
                     raise e
+        for attr in self._attrs_cached_as_arrays:
+            if isinstance(getattr(self, attr), tuple):
+                keys, counts = getattr(self, attr)
+                setattr(self, attr, dict(zip(keys.tolist(), counts.tolist())))
+        self._vocab = {word: i for i, word in enumerate(self._words)}
+        # caches written by earlier versions store Counters of tokens and of pairs of tokens
+        if '_token_stats' in state and '_words' not in state: 
+            token_stats = state['_token_stats']
+            self._add_token_counts(list(token_stats.keys()), list(token_stats.values()))
+        if '_pair_stats' in state and '_pair_counts' not in state:
+            self._pair_counts = self._encode_pairs(state['_pair_stats'])
+            self._skip_pair_counts = self._encode_pairs(state.get('_skip_pair_stats', {}))
+            self._grow_token_counts()
         end = time.process_time()
         log(f'successfully loaded cached data from {self._cache_dir}/{self._cache_tag} in {end-start:.3f} seconds')
 
     def to_cache(self):
         '''
-        dump critical state data of this instance to cache
+        dump critical state data of this instance to cache. the state is written
+        to a temporary file which then replaces the cache file, so that an interrupted
+        write never leaves behind a partially updated cache
         '''
         log(f'caching to {self._cache_dir}/{self._cache_tag}')
         start = time.process_time()
-        for attr, _ in self._attrs_to_cache:
-            obj = getattr(self, attr)
-            self.cache[attr] = obj
-
-        self.cache.commit()
+        state = {attr: getattr(self, attr) for attr, _ in self._attrs_to_cache}
+        for attr in self._attrs_cached_as_arrays:
+            counts = state[attr]
+            state[attr] = (np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)),
+                           np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+        tmp = self.cache.with_name(self.cache.name + '.tmp')
+        joblib.dump(state, tmp, compress=_CACHE_COMPRESSION)
+        os.replace(tmp, self.cache)
         end = time.process_time()
         log(f'successfully cached to {self._cache_dir}/{self._cache_tag} in {end-start:.3f} seconds')
 
@@ -223,7 +353,7 @@ class Corpus:
     #### read corpus
     ################################################################ 
 
-    def read(self, batch_size: int = 5_000, parallel: bool = True):
+    def read(self, batch_size: int = 5_000, parallel: bool = True, checkpoint_every: int = 16):
         """Reads a parsed corpus file.
             the corpus file is formatted similar to the example in the `sample_input`
             directory of this project, or according to a custom format which specified at
@@ -231,212 +361,441 @@ class Corpus:
             
         Args:
             batch_size (int, optional): Size of sentence batches to accummulate before
-                processing. Writing to cache is also done in `batch_size` increments.
-                Defaults to 5_000.
+                processing. Defaults to 5_000.
+            parallel (bool, optional): when reading the whole corpus, read each of its files
+                in a separate process and merge their stats. `checkpoint_every` then counts 
+                files rather than batches. Defaults to True.
+            checkpoint_every (int, optional): number of sentence batches to process between
+                writes to cache. Defaults to 16.
         """
-        from stanza.models.common.doc import Document
-        
-        dummy_line = lambda: f'{"__EOF__"}{self._sep}' + self._sep.join(map(str, range(6 + 10)))
+        if parallel and self._n_sentences >= float('inf') and len(self._files) > 1:
+            return self._read_parallel(batch_size, checkpoint_every)
+        if self._sentences_seen >= self._n_sentences:
+            log(f'already processed {self._sentences_seen} sentences; nothing to read')
+            return
+
         # if we are resuming from previous state, we want to skip lines that are already processed.
-        lines_to_skip = self._lines_read
+        files = self._files_to_read()
         n_sentences = self._n_sentences # upper limit
-
-        # sum the total lines in a file for tqdm without loading them all in memory
-        if self._total is None:
-            if n_sentences >= float('inf'):
-                with fileinput.input(files=self._files) as f:
-                    self._total = sum(1 for _ in tqdm(f, desc=f'counting # of lines in corpus'))
-                log(f'Preparing to read {self._total} lines')
-            else:
-                self._total = n_sentences
-                log(f'Preparing to read {self._total} sentences')
+        # decided once here rather than comparing against infinity inside the loop
+        finite = n_sentences < float('inf')
+
+        # size the progressbar by bytes on disk rather than by a separate pass over the 
+        # corpus to count its lines, which would double the I/O
+        if not finite:
+            self._total = sum(content_size(path) for path, _ in files)
+            log(f'Preparing to read {self._total:,} bytes')
+            T_kws = dict(unit='B', unit_scale=True)
+        else:
+            self._total = n_sentences
+            log(f'Preparing to read {self._total} sentences')
+            T_kws = dict()
 
         anchor_time = time.process_time()
-        with fileinput.input(files=self._files) as f, tqdm(total=self._total, leave=False) as T:
-            # more_itertools.peekable allows seeing future context without using up item from iterator
-            f = peekable(f)
+        with tqdm(total=self._total, leave=False, **T_kws) as T:
 
-            if n_sentences >= float('inf'): # process all sentences; progressbar tracks # of lines
-                T.update(self._lines_read)
-            else: # process a predetermiend # of sentences; also reflected in progressbar
+            if finite: # process a predetermiend # of sentences; also reflected in progressbar
                 T.update(self._sentences_seen)
 
-            sentence_batch = [] # accumulate parsed sentences to process concurrently, saving time
-            this_sentence = []
-            self._current_file = fileinput.filename()
+            batches = self._iter_sentencebatches(files, batch_size, n_sentences - self._sentences_seen)
+            for n_batches, (sb, sents_read, nbytes) in enumerate(batches, 1):
+                ################################################################ 
+                #### this is where the sentencebatch is processed ##############
+                ################################################################ 
+                self.digest_sentencebatch(sb, parallel=parallel)
+                ################################################################ 
+
+                self._lines_read += len(sb.ids)
+                self._sentences_seen += sents_read
+                T.update(sents_read if finite else nbytes)
+                if n_batches % checkpoint_every == 0:
+                    self.to_cache()
+
+                this_time = time.process_time()
+                log(f'processed sentence_batch of size {sents_read} in {this_time-anchor_time:.3f} sec '
+                    f'({sents_read/(this_time-anchor_time):.3f} sents/sec)')
+                log(f'accumulated unique tokens: {len(self._words):,}; '
+                    f'accumulated unique pairs: {len(self._pair_counts):,}; '
+                    f'sentences seen: {self._sentences_seen:,}')
+                anchor_time = this_time
+
+            self.to_cache()
+            log(f'finished processing after seeing {self._sentences_seen} sentences.')
+
 
-            for line in f:
-                # skip lines to catch up to the previously stored state
-                if lines_to_skip > 0:
-                    lines_to_skip -= 1
+    def _files_to_read(self) -> typing.List[typing.Tuple[Path, int]]:
+        """Pairs each file of the corpus that has not been completely processed yet with the 
+            number of its leading lines that have (when resuming from previous state).
+
+        Returns:
+            typing.List[typing.Tuple[Path, int]]: files to read, and lines to skip in each
+        """
+        remaining = self._lines_read
+        files = []
+        for path in self._files:
+            if remaining > 0:
+                n_lines = self._count_lines(path)
+                if n_lines <= remaining:
+                    remaining -= n_lines
                     continue
+            files += [(path, remaining)]
+            remaining = 0
+        return files
+
+    def _count_lines(self, path: Path) -> int:
+        '''
+        counts the lines of a file of the corpus, reusing the count from an earlier run
+        if the file has not changed since
+        '''
+        st = path.stat()
+        mtime, size, n_lines = self._line_counts.get(str(path), (None, None, None))
+        if (mtime, size) != (st.st_mtime_ns, st.st_size):
+            n_lines = count_lines(path)
+            self._line_counts[str(path)] = st.st_mtime_ns, st.st_size, n_lines
+        return n_lines
+
+    def _read_parallel(self, batch_size: int, checkpoint_every: int = 16):
+        """Reads the files of the corpus in separate processes, merging the stats of each 
+            file in order as they become available.
 
-                # if line.strip() == '': continue
-                if self._current_file != fileinput.filename():
-                    self._current_file = fileinput.filename()
-                    log(f'processing {self._current_file}')
-
-                parse = self.segment_line(line, sep=self._sep, fmt=self._fmt)
-                if self._lower: 
-                    parse['text'] = parse['text'].lower()
-                # sentence_id is only unique within a filename, so two files containing sequential
-                # sentence IDs (e.g., [1,], [1,2,3,]) will cause result in the concatenation of two
-                # distinct sentences (which would be an issue since the token_ids are valid within a sentence)
-                parse['sentence_id'] = f"{fileinput.filename()}_{parse['sentence_id']}"
-                this_sentence += [parse]
-
-                # have we crossed a sentence boundary? alternatively, are we out of lines to process?
-                next_parse = self.segment_line(f.peek(dummy_line()), sep=self._sep, fmt=self._fmt) # uses dummy line if no more lines to process
-                next_parse['sentence_id'] = f"{fileinput.filename()}_{next_parse['sentence_id']}"
-                if next_parse['sentence_id'] != parse['sentence_id']:
-
-                    # process current sentence and reset the "current sentence"
-                    [sent] = Document([this_sentence]).sentences
-                    sentence_batch += [sent]
-
-                    if (sents_read := len(sentence_batch)) >= batch_size or self._sentences_seen+sents_read >= n_sentences:
-
-                        ################################################################ 
-                        #### this is where the sentencebatch is processed ##############
-                        ################################################################ 
-                        self.digest_sentencebatch(sentence_batch, parallel=parallel)
-                        ################################################################ 
-
-                        lines_read = sum(len(s.words) for s in sentence_batch)
-                        sentence_batch = []
-
-                        self._lines_read += lines_read
-                        self._sentences_seen += sents_read
-                        if self._total < float('inf'):
-                            T.update(sents_read)
-                        else:
-                            T.update(lines_read)
-                        self.to_cache()
-
-                        this_time = time.process_time()
-                        log(f'processed sentence_batch of size {sents_read} in {this_time-anchor_time:.3f} sec '
-                            f'({sents_read/(this_time-anchor_time):.3f} sents/sec)')
-                        log(f'accumulated unique tokens: {len(self._token_stats):,}; '
-                            f'accumulated unique pairs: {len(self._pair_stats):,}; '
-                            f'sentences seen: {self._sentences_seen:,}')
-                        anchor_time = this_time
-
-                    this_sentence = []
-
-                if self._sentences_seen >= n_sentences:
+        Args:
+            batch_size (int): Size of sentence batches to accummulate before processing
+            checkpoint_every (int, optional): number of files to merge between writes to
+                cache. Defaults to 16.
+        """
+        import multiprocessing
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        from itertools import islice
+
+        # if we are resuming from previous state, find out which files, or lines within a file,
+        # have already been processed
+        files = self._files_to_read()
+        paths = [path for path, _ in files]
+
+        self._total = sum(map(content_size, paths))
+        log(f'Preparing to read {self._total:,} bytes from {len(paths)} files in parallel')
+
+        max_workers = os.cpu_count() or 1
+        # workers are spawned rather than forked: a process forked after numba has started its
+        # thread pool (e.g. in `sparse_entropy`) hangs on exit, and the pool with it
+        mp_context = multiprocessing.get_context('spawn')
+        anchor_time = time.process_time()
+        with ProcessPoolExecutor(max_workers, mp_context=mp_context) as executor, \
+             tqdm(total=self._total, leave=False, unit='B', unit_scale=True) as T:
+            worker = self._worker_copy()
+            jobs = (executor.submit(_digest_file, worker, path, lines_to_skip, batch_size)
+                    for path, lines_to_skip in files)
+            # files are submitted only as earlier ones are merged, so that no more than about
+            # `max_workers` results are ever held in memory waiting for their turn
+            pending = deque(islice(jobs, max_workers))
+            for n_files, path in enumerate(paths, 1):
+                (words, token_counts, pair_counts, skip_pair_counts, triplet_stat, 
+                 sents_read, lines_read) = pending.popleft().result()
+                pending.extend(islice(jobs, 1))
+
+                self._add_token_counts(words, token_counts)
+                self._add_pair_counts(words, pair_counts, self._pair_counts)
+                self._add_pair_counts(words, skip_pair_counts, self._skip_pair_counts)
+                for rel, stat in triplet_stat.items():
+                    self._triplet_stats[rel].update(stat)
+
+                self._lines_read += lines_read
+                self._sentences_seen += sents_read
+                self._current_file = path
+                T.update(content_size(path))
+                if n_files % checkpoint_every == 0:
                     self.to_cache()
-                    break
 
-            log(f'finished processing after seeing {self._sentences_seen} sentences.')
+                this_time = time.process_time()
+                log(f'merged {path} ({sents_read} sentences) after {this_time-anchor_time:.3f} sec')
+                log(f'accumulated unique tokens: {len(self._words):,}; '
+                    f'accumulated unique pairs: {len(self._pair_counts):,}; '
+                    f'sentences seen: {self._sentences_seen:,}')
+                anchor_time = this_time
 
+            self.to_cache()
+        log(f'finished processing after seeing {self._sentences_seen} sentences.')
 
-    def digest_sentencebatch(self, sb: typing.List['stanza.models.common.doc.Sentence'],
-                             parallel: bool = True):
+    def _read_chunks(self, path: Path, lines_to_skip: int = 0, 
+                     chunk_lines: int = 1 << 18) -> typing.Iterator[typing.Tuple[typing.Dict[str, np.ndarray], int]]:
+        """Reads a file of the corpus (gzipped files are decompressed on the fly) in bulk using
+            pandas' C parser, `chunk_lines` lines at a time, rather than parsing it line by line.
+
+        Args:
+            path (Path): file of the corpus, one token per line
+            lines_to_skip (int, optional): number of leading lines that were already processed.
+                Defaults to 0.
+            chunk_lines (int, optional): number of lines to parse at a time. Defaults to 1 << 18.
+
+        Yields:
+            typing.Tuple[typing.Dict[str, np.ndarray], int]: label -> typecast values of each 
+                column in `fmt` over the lines of a chunk, and the number of bytes read for it
+        """
+        labels = [label for label, _ in self._schema]
+        dtype = {label: {int: np.int64, float: np.float64}.get(typecast, object) 
+                 for label, typecast in self._schema}
+        # any other types are cast elementwise after parsing
+        casts = {label: typecast for label, typecast in self._schema 
+                 if dtype[label] is object and typecast is not str}
+
+        with open_binary(path) as f:
+            reader = pd.read_csv(f, sep=self._sep, header=None, names=labels, index_col=False, dtype=dtype,
+                                 # tokens are taken verbatim: no quoting, and no NA values (e.g. 'null')
+                                 quoting=csv.QUOTE_NONE, na_filter=False, encoding='utf-8',
+                                 # blank lines are kept (and fail to parse) so that every line is
+                                 # counted, like by `count_lines` and `skiprows` when resuming
+                                 skip_blank_lines=False,
+                                 skiprows=lines_to_skip, chunksize=chunk_lines,
+                                 engine='c' if len(self._sep) == 1 else 'python')
+            offset = 0
+            for df in reader:
+                if df.empty: # e.g., an empty file
+                    continue
+                cols = {label: df[label].to_numpy() for label in labels}
+                for label, typecast in casts.items():
+                    cols[label] = np.array([typecast(v) for v in cols[label]], dtype=object)
+                nbytes, offset = f.tell() - offset, f.tell()
+                yield cols, nbytes
+
+    def _iter_sentencebatches(self, files: typing.Iterable[typing.Tuple[Path, int]], 
+                              batch_size: int, max_sentences: float = float('inf'),
+                              ) -> typing.Iterator[typing.Tuple[SentenceBatch, int, int]]:
+        """Reads the files of the corpus in turn (see `_read_chunks`) and cuts them into batches of
+            whole sentences, detecting sentence boundaries by a change in `sentence_id` from one 
+            line to the next, or the end of a file.
+
+        Args:
+            files (typing.Iterable[typing.Tuple[Path, int]]): files of the corpus, along with the
+                number of leading lines of each that were already processed (see `_files_to_read`)
+            batch_size (int): number of sentences per batch
+            max_sentences (float, optional): stop after this many sentences. Defaults to inf.
+
+        Yields:
+            typing.Tuple[SentenceBatch, int, int]: a batch, the number of sentences in it, and 
+                the number of bytes read since the previous batch was yielded
+        """
+        remaining = max_sentences
+        if remaining <= 0:
+            return
+        nbytes = 0
+        for path, lines_to_skip in files:
+            self._current_file = path
+            log(f'processing {self._current_file}')
+
+            # lines from the end of the previous chunk that are not part of a yielded batch yet
+            carry = None
+            chunks = self._read_chunks(path, lines_to_skip=lines_to_skip)
+            if (os.cpu_count() or 1) > 1: # read and parse the next chunk while this one is processed
+                chunks = prefetch(chunks)
+            for cols, chunk_bytes in chunks:
+                nbytes += chunk_bytes
+                if carry is not None:
+                    cols = {label: np.concatenate([carry[label], values]) for label, values in cols.items()}
+                starts = _sentence_starts(cols['sentence_id'])
+                # the last sentence of a chunk may continue into the next chunk, so it is carried over
+                i = 0
+                while len(starts) - 1 - i >= (n := min(batch_size, remaining)):
+                    lo, hi = starts[i], starts[i+n]
+                    yield self._encode_sentencebatch({k: v[lo:hi] for k, v in cols.items()}), n, nbytes
+                    nbytes, remaining, i = 0, remaining - n, i + n
+                    if remaining <= 0:
+                        return
+                carry = {k: v[starts[i]:] for k, v in cols.items()} if i < len(starts) else None
+
+            # sentence_id is only unique within a filename, so two files containing sequential
+            # sentence IDs (e.g., [1,], [1,2,3,]) would otherwise result in the concatenation of two
+            # distinct sentences. so, a batch never continues into the next file
+            if carry is not None:
+                starts = np.r_[_sentence_starts(carry['sentence_id']), len(carry['sentence_id'])]
+                i = 0
+                while i < len(starts) - 1:
+                    n = min(batch_size, remaining, len(starts) - 1 - i)
+                    lo, hi = starts[i], starts[i+n]
+                    yield self._encode_sentencebatch({k: v[lo:hi] for k, v in carry.items()}), n, nbytes
+                    nbytes, remaining, i = 0, remaining - n, i + n
+                    if remaining <= 0:
+                        return
+
+    def _encode_sentencebatch(self, cols: typing.Dict[str, np.ndarray]) -> SentenceBatch:
+        """Converts the columns of a batch of whole sentences into a `SentenceBatch`, assigning 
+            each previously unseen `Word` the next integer id. Only the distinct (text, upos) 
+            combinations of the batch are looked up in the vocabulary.
+
+        Args:
+            cols (typing.Dict[str, np.ndarray]): label -> values of each column (see `_read_chunks`)
+
+        Returns:
+            SentenceBatch: ids, heads, upos, and deprel of the tokens in the batch
+        """
+        n = len(cols['sentence_id'])
+        # position in the batch of the first token of the sentence each token belongs to
+        sentence_start = np.zeros(n, dtype=np.int64)
+        sentence_start[_sentence_starts(cols['sentence_id'])] = 1
+        sentence_start = np.maximum.accumulate(np.where(sentence_start, np.arange(n), 0))
+        heads = cols['head'].astype(np.int64)
+        heads = np.where(heads > 0, sentence_start + heads - 1, -1)
+
+        # factorize (text, upos) combinations so that the vocabulary is consulted once per combination
+        text_codes, texts = pd.factorize(cols['text'])
+        upos_codes, uposes = pd.factorize(cols['upos'])
+        n_upos = len(uposes)
+        codes, keys = pd.factorize(text_codes.astype(np.int64) * n_upos + upos_codes)
+        texts, uposes = texts.tolist(), uposes.tolist()
+
+        lower, word_id = self._lower, self._word_id
+        lookup = np.empty(len(keys), dtype=np.int64)
+        for j, key in enumerate(keys.tolist()):
+            text = texts[key // n_upos]
+            lookup[j] = word_id(Word(text.lower() if lower else text, uposes[key % n_upos]))
+
+        return SentenceBatch(lookup[codes], heads, cols['upos'], cols['deprel'])
+
+
+    def digest_sentencebatch(self, sb: SentenceBatch,
+                             parallel: bool = True,
+                             triple = ('ADJ', 'NOUN', 'VERB'), # we're looking for VERB_ADJ_NOUN
+                             ):
         """Digests a sentencebatch containing sentences by computing its token
             and pair occurrence stats and updating the instance's counter objects
-            tracking the global stats for this corpus
+            tracking the global stats for this corpus. Tokens are mapped to integer ids
+            so that the edges of the whole batch are counted with array operations rather
+            than per sentence in Python.
 
         Args:
-            sb (list): sentencebatch containing stanza Sentences
+            sb (SentenceBatch): sentencebatch containing whole sentences (see `_encode_sentencebatch`)
+            parallel (bool): unused; counting the integer-coded batch in-process is
+                cheaper than dispatching sentences to workers
+            triple (tuple): upos of (child, parent, grandparent) to collect triplets for
         """        
-        # accumulate statistics about words and word pairs in the sentence
-        stats = Parallel(n_jobs=(-1 if parallel else 1))(delayed(self._digest_sentence)(sent) for sent in sb)
-        for token_stat, pair_stat, skip_pair_stat, triplet_stat_obj, triplet_stat_nsubj in stats:
-            self._token_stats.update(token_stat)
-            self._pair_stats.update(pair_stat)
-            self._skip_pair_stats.update(skip_pair_stat)
-            self._triplet_stats['obj'].update(triplet_stat_obj)
-            self._triplet_stats['nsubj'].update(triplet_stat_nsubj)
+        ids, heads, upos, deprel = sb
+        words = self._words
+
+        # accumulate statistics about words and word pairs in the batch
+        token_counts = np.bincount(ids, minlength=len(words))
+        self._grow_token_counts()
+        self._token_counts += token_counts
+
+        # every non-root token is the child in an edge; those whose parent is not the root
+        # are additionally the child in a skip-edge to their grandparent
+        child = np.flatnonzero(heads >= 0)
+        parent = heads[child]
+        has_grandparent = heads[parent] >= 0
+
+        # pack each edge as `child << 32 | parent` and count the distinct codes
+        pair_counts = _count_keys((ids[child] << 32) | ids[parent])
+        skip_pair_counts = _count_keys((ids[child[has_grandparent]] << 32) | 
+                                       ids[heads[parent[has_grandparent]]])
+        _add_counts(self._pair_counts, pair_counts)
+        _add_counts(self._skip_pair_counts, skip_pair_counts)
+
+        # triplets are a small subset of the skip-edges, so we find them with array masks
+        child, parent = child[has_grandparent], parent[has_grandparent]
+        grandparent = heads[parent]
+        match = (upos[child] == triple[0]) & (upos[parent] == triple[1]) & (upos[grandparent] == triple[2])
+        triplets = [((words[q], words[c], words[ids[p]]), deprel[p])
+                    for c, p, q in zip(ids[child[match]].tolist(), parent[match].tolist(),
+                                       ids[grandparent[match]].tolist())]
+        # updating from an iterable of keys counts them in C rather than with `+= 1` per key
+        self._triplet_stats['obj'].update(t for t, rel in triplets if rel in ('obj',))
+        self._triplet_stats['nsubj'].update(t for t, rel in triplets if rel in ('nsubj', 'nsubj:pass'))
+
+    def _word_id(self, word: Word) -> int:
+        '''
+        returns the integer id of `word`, assigning it the next id if it has not been seen yet
+        '''
+        i = self._vocab.get(word)
+        if i is None:
+            i = self._vocab[word] = len(self._words)
+            self._words.append(word)
+        return i
 
-    @classmethod
-    def _digest_sentence(cls, 
-                         sent: 'stanza.models.common.doc.Sentence',
-                         return_context=True) -> typing.Tuple[Counter, Counter]:
-        """'digests' a sentence into counts of tokens and token pairs in it
+    def _grow_token_counts(self):
+        '''
+        extends the array of token counts with zeros for newly assigned ids
+        '''
+        n = len(self._words) - len(self._token_counts)
+        if n > 0:
+            self._token_counts = np.concatenate([self._token_counts, np.zeros(n, dtype=np.int64)])
+
+    def _word_ids(self, words: typing.Sequence[Word]) -> np.ndarray:
+        '''
+        maps a sequence of `Word`s, e.g., the vocabulary of another `Corpus`, to this object's ids
+        '''
+        return np.fromiter(map(self._word_id, words), dtype=np.int64, count=len(words))
+
+    def _add_token_counts(self, words: typing.Sequence[Word], counts: typing.Sequence[int]):
+        '''
+        adds the counts of tokens that are identified by `Word` rather than by this object's ids, 
+        e.g., counted by another `Corpus`
+        '''
+        ids = self._word_ids(words)
+        self._grow_token_counts()
+        # ids are distinct, so there is no need for an unbuffered `np.add.at`
+        self._token_counts[ids] += np.asarray(counts, dtype=np.int64)
+
+    def _add_pair_counts(self, words: typing.Sequence[Word], counts: typing.Mapping[int, int], 
+                         stats: typing.Dict[int, int]):
+        '''
+        adds pair counts keyed by the ids of another vocabulary, `words`, to `stats`
+        '''
+        ids = self._word_ids(words)
+        keys = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        keys = (ids[keys >> 32] << 32) | ids[keys & 0xFFFFFFFF]
+        _add_counts(stats, dict(zip(keys.tolist(), counts.values())))
+
+    def _encode_pairs(self, pair_stats: typing.Mapping[typing.Tuple[Word, Word], int]) -> typing.Dict[int, int]:
+        '''
+        packs the (child, parent) keys of `pair_stats` into ints using this object's ids
+        '''
+        return {self._word_id(w) << 32 | self._word_id(p): ct for (w, p), ct in pair_stats.items()}
+
+    def _decode_pairs(self, counts: typing.Mapping[int, int]) -> Counter:
+        '''
+        unpacks the keys of `counts` into (child, parent) pairs of `Word`s
+        '''
+        words = self._words
+        return Counter({(words[key >> 32], words[key & 0xFFFFFFFF]): ct for key, ct in counts.items()})
+
+    @staticmethod
+    def _compile_fmt(fmt: typing.Iterable[str]) -> typing.Tuple[typing.Tuple[str, typing.Callable], ...]:
+        """Resolves a format specification like ('sentence_id:int', 'text:str', ...) into
+            (label, typecast) pairs once, so that parsing a line does not need to split
+            the specification or look up types by name again.
 
         Args:
-            sent (stanza.models.common.doc.Sentence): input Sentence
+            fmt (typing.Iterable[str]): 'label:type' for each column, in order
 
         Returns:
-            typing.Tuple[Counter, Counter]: token_stats, pair_stats for this sentence
-        """        
-        token_stat = Counter([Word(w.text, w.upos) for w in sent.words])
-        pair_stat, skip_pair_stat, triplet_stat_obj, triplet_stat_nsubj = [*map(Counter, cls._extract_edges_from_sentence(sent))]
-        # if return_context:
-        #     return token_stat, pair_stat, triplet_stat, ' '.join(w.text for w in sent.words)
-        return token_stat, pair_stat, skip_pair_stat, triplet_stat_obj, triplet_stat_nsubj
+            typing.Tuple[typing.Tuple[str, typing.Callable], ...]: (label, typecast) per column
+        """
+        import pydoc
+        schema = []
+        for item in fmt:
+            label, typ = item.split(':')
+            # if an explicit Python type is provided, cast the label to it
+            schema.append((label, pydoc.locate(typ or 'str') or str))
+        return tuple(schema)
 
-    @classmethod
-    def segment_line(cls, line: str, sep:str, fmt:typing.Iterable[str]) -> dict:
+    def segment_line(self, line: str) -> dict:
         """Reads the columns from a line corresponding to a single token in a parse.  Returns them
             as a labeled dictionary, with labels corresponding to the `fmt` list in the order of
             appearance.
         
         Args:
-            line (str): _description_
-            sep (str): _description_
-            fmt (typing.Iterable[str]): _description_
+            line (str): a line of the corpus, with columns separated by `sep`
 
         Returns:
-            dict: _description_
+            dict: label -> typecast value of each column in `fmt`
         """       
-        import pydoc
-        doc = {}
-        row = line.strip().split(sep)
-        # if fmt is specified, override self._fmt; else fall back on self._fmt
-        for i, item in enumerate(fmt):
-            label, typ = item.split(':')
-            # if an explicit Python type is provided, cast the label to it
-            typecast = pydoc.locate(typ or 'str')
-            try:
-                value = typecast(row[i])
-            except IndexError:
-                log('ERR:', line, line.strip().split(sep))
-                raise
-            doc[label] = value
-        return doc
-
-
-    @classmethod
-    def _extract_edges_from_sentence(cls,
-                                     sentence: 'stanza.models.common.doc.Sentence',
-                                     triple = ('ADJ', 'NOUN', 'VERB') # we're looking for VERB_ADJ_NOUN
-                                     ) -> typing.Iterable[typing.Tuple[Word, Word]]:
-        """Extracts all the edges in the dependecy tree of the sentence, returns them
-            as tuples of `Word` (with text and upos information preserved)
+        row = line.strip().split(self._sep)
+        try:
+            return {label: typecast(row[i]) for i, (label, typecast) in enumerate(self._schema)}
+        except IndexError:
+            log('ERR:', line, row)
+            raise
 
-        Args:
-            sentence: a stanza Sentence containing a dependency parse
 
-        Returns:
-            typing.List[typing.Tuple[Word]]: Edges in the sentence
-        """                                     
-        edges = []
-        skip_edges = []
-        triplets_obj = []
-        triplets_nsubj = []
-        for w in sentence.words:
-            # if w is root, it has no head, so skip
-            if w.head == 0: 
-                continue
-            p = sentence.words[w.head-1]
-            edges += [(Word(w.text, w.upos), Word(p.text, p.upos))]
-
-            # this is to additionally extract the VERB
-            if p.head == 0: 
-                continue
-            q = sentence.words[p.head-1]
-            skip_edges += [(Word(w.text, w.upos), Word(q.text, q.upos))]
-
-            if (w.upos, p.upos, q.upos) == triple:
-                if p.deprel in ('obj',):
-                    triplets_obj += [(Word(q.text, q.upos), Word(w.text, w.upos), Word(p.text, p.upos))]
-                if p.deprel in ('nsubj', 'nsubj:pass'):
-                    triplets_nsubj += [(Word(q.text, q.upos), Word(w.text, w.upos), Word(p.text, p.upos))]
-
-        return edges, skip_edges, triplets_obj, triplets_nsubj
-
- 
     ################################################################ 
     #### miscellaneous analysis-related stuff
     ################################################################ 
@@ -445,41 +804,92 @@ class Corpus:
                        child_upos: str = None, 
                        parent_upos: str = None) -> "networkx.Graph":
         '''
+        builds a graph of the (child, parent) pairs with the given upos (None for any), 
+        weighted by their number of occurrences
         '''
-        raise NotImplementedError
-        wg = WordGraph(((w,p) for w,p in self.pair_stats
-                        if (child_upos is None or w.upos == child_upos) and \
-                           (parent_upos is None or p.upos == parent_upos)))
+        wg = WordGraph({(w, p): ct for w, p, ct in self.iter_pair_counts(child_upos or '*', 
+                                                                         parent_upos or '*')})
 
         return wg
 
 
-    # def extract_combinations(self,
-    #                          child_upos, parent_upos,
-    #                          collapse_by_token: bool = True,
-    #                          ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    def extract_combinations(self,
+                             child_upos: str, parent_upos: str,
+                             collapse_by_token: bool = True,
+                             ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Aggregates the pairs with the given child and parent upos by child and by parent.
 
-    #     child_to_parent = defaultdict(int)
-    #     parent_to_child = defaultdict(int)
+        Args:
+            child_upos (str): upos of the child in a pair, or '*' for any
+            parent_upos (str): upos of the parent in a pair, or '*' for any
+            collapse_by_token (bool, optional): count the number of distinct pairs a token
+                occurs in rather than the number of occurrences of these pairs. Defaults to True.
 
-    #     for (w,p), ct in self._pair_stats.items():
-    #         if (child_upos == '*' or w.upos == child_upos) and (parent_upos == '*' or p.upos == parent_upos):
-    #             child_to_parent[w] += 1 if collapse_by_token else ct
-    #             parent_to_child[p] += 1 if collapse_by_token else ct
+        Returns:
+            typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: counts and labels
+                for children, then counts and labels for parents, each in descending order of count
+        """
+        return self.top_k_combinations(child_upos, parent_upos, k=None, collapse_by_token=collapse_by_token)
 
-    #     return child_to_parent, parent_to_child
+    def top_k_combinations(self,
+                           child_upos: str, parent_upos: str,
+                           k: int = 100,
+                           collapse_by_token: bool = True,
+                           ) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Like `extract_combinations`, but only returns the `k` children and `k` parents with the
+            highest counts.
 
-        child_to_parent_arr = np.array(sorted(child_to_parent.values(), key=lambda c:-c))
-        parent_to_child_arr = np.array(sorted(parent_to_child.values(), key=lambda c:-c))
+        Args:
+            child_upos (str): upos of the child in a pair, or '*' for any
+            parent_upos (str): upos of the parent in a pair, or '*' for any
+            k (int, optional): number of children and of parents to return; None for all. 
+                Defaults to 100.
+            collapse_by_token (bool, optional): count the number of distinct pairs a token
+                occurs in rather than the number of occurrences of these pairs. Defaults to True.
 
-        child_to_parent_labels = np.array(sorted(child_to_parent.keys(), key=lambda k:-child_to_parent[k]))
-        parent_to_child_labels = np.array(sorted(parent_to_child.keys(), key=lambda k:-parent_to_child[k]))
+        Returns:
+            typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: counts and labels
+                for children, then counts and labels for parents, each in descending order of count
+        """
+        words = self._words
+        keys = np.fromiter(self._pair_counts.keys(), dtype=np.int64, count=len(self._pair_counts))
+        counts = np.fromiter(self._pair_counts.values(), dtype=np.int64, count=len(self._pair_counts))
+        child, parent = keys >> 32, keys & 0xFFFFFFFF
+
+        # select pairs by looking up the upos of their ids rather than decoding each pair
+        upos = np.array([upos for _, upos in words], dtype=str)
+        mask = np.ones(len(keys), dtype=bool)
+        if child_upos != '*':
+            mask &= upos[child] == child_upos
+        if parent_upos != '*':
+            mask &= upos[parent] == parent_upos
+        weights = None if collapse_by_token else counts[mask]
+
+        def rank(ids: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+            uniq, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights, minlength=len(uniq)).astype(np.int64)
+            candidates = np.arange(len(uniq))
+            if k is not None and 0 < k < len(uniq):
+                # select the k highest totals in linear time so that only these are sorted; of
+                # the tokens tied with the k-th total, keep those that occur first
+                kth = totals[np.argpartition(-totals, k - 1)[k - 1]]
+                above = np.flatnonzero(totals > kth)
+                tied = np.flatnonzero(totals == kth)
+                n_tied = k - len(above)
+                tied = tied[np.argpartition(first[tied], n_tied - 1)[:n_tied]]
+                candidates = np.concatenate([above, tied])
+            # ties are broken by the order in which tokens first occur among the pairs
+            order = candidates[np.lexsort((first[candidates], -totals[candidates]))][:k]
+            labels = np.empty(len(order), dtype=object)
+            labels[:] = [words[i] for i in uniq[order].tolist()]
+            return totals[order], labels
+
+        child_to_parent_arr, child_to_parent_labels = rank(child[mask])
+        parent_to_child_arr, parent_to_child_labels = rank(parent[mask])
 
         return child_to_parent_arr, child_to_parent_labels, parent_to_child_arr, parent_to_child_labels
 
 
-
-
 class ChainedCorpus(Corpus):
 
     def __init__(self,
@@ -495,6 +905,7 @@ class ChainedCorpus(Corpus):
         self._cache_dir = cache_dir
         self._cache_tag = cache_tag
         self._directory_or_filelist = directory_or_filelist
+        self._init_stats()
         if load: self.load_cache()
 
 
@@ -516,9 +927,10 @@ class ChainedCorpus(Corpus):
                         reduce_operand += [getattr(self, attr)]
                     ob = reduce(redfn, reduce_operand)
                     setattr(self, attr, ob)
-
-            # close connection to SQLite after done loading
-            c._close_cache()
+            # tokens and pairs are stored by id, and ids differ between corpora
+            self._add_token_counts(c._words, c._token_counts)
+            self._add_pair_counts(c._words, c._pair_counts, self._pair_counts)
+            self._add_pair_counts(c._words, c._skip_pair_counts, self._skip_pair_counts)
 
             if self._cache_dir is not None and self._cache_tag is not None:
                 log(f'caching {self}')
@@ -1,5 +1,7 @@
 
-from collections import defaultdict
+from collections import Counter
+from collections.abc import Mapping
+from itertools import chain
 
 import numpy as np
 # import graph_tool.all as gt
@@ -8,24 +10,31 @@ from pyvis.network import Network
 
 
 class WordGraph:
+
+    _rng = np.random.default_rng()
         
     def __init__(self, wordpairs, backend='nx'):
-            
-        g = nx.DiGraph()
-        nodes = {} # tuple -> int
-        edges = defaultdict(int)
-
-        for w, p in wordpairs:
-            nodes[w] = nodes.get(w, len(nodes))
-            nodes[p] = nodes.get(p, len(nodes))
+        '''
+        builds a directed graph of (child, parent) word pairs, given either one pair per 
+        occurrence or a mapping of each distinct pair to its number of occurrences
+        '''
+        if isinstance(wordpairs, Mapping):
+            edges = wordpairs
+            pairs = wordpairs.keys()
+        else:
+            pairs = list(wordpairs)
+            edges = Counter(pairs) # tuple -> int
+        # in order of first occurrence, whether each word last occurred as a child (0) 
+        # or a parent (1) in a pair
+        sides = dict(chain.from_iterable(((w, 0), (p, 1)) for w, p in pairs))
+        nodes = {word: i for i, word in enumerate(sides)} # tuple -> int
 
-            g.add_node(nodes[w], label=str(w), group=str(w.upos), bipartite=0)
-            g.add_node(nodes[p], label=str(p), group=str(p.upos), bipartite=1)
-
-            edges[nodes[w], nodes[p]] += 1
-
-        for edge, numocc in edges.items():
-            g.add_edge(*edge, label=numocc, value=numocc)
+        # adding nodes and edges in bulk rather than one call at a time
+        g = nx.DiGraph()
+        g.add_nodes_from((i, dict(label=str(word[0]), group=str(word[1]), bipartite=sides[word]))
+                         for word, i in nodes.items())
+        g.add_edges_from((nodes[w], nodes[p], dict(label=numocc, value=numocc))
+                         for (w, p), numocc in edges.items())
                 
         self.g = g
         
@@ -33,7 +42,9 @@ class WordGraph:
     def subgraph(self, n_nodes) -> nx.DiGraph:
         if n_nodes in {None, -1, 0}:
             return self.g
-        return self.g.subgraph(np.random.choice(self.g.nodes, n_nodes))
+        # nodes are numbered 0..n-1, so we can sample (distinct) ids without listing the nodes
+        ids = self._rng.choice(len(self.g), size=min(n_nodes, len(self.g)), replace=False, shuffle=False)
+        return self.g.subgraph(ids.tolist())
 
 
     @classmethod
@@ -1,8 +1,12 @@
 
+import mmap
+import os
 import typing
 from sys import stderr
 from pathlib import Path
 
+import numpy as np
+
 
 def log(*args, **kwargs):
     '''
@@ -35,4 +39,74 @@ def iterable_from_directory_or_filelist(directory_or_filelist) -> typing.Iterabl
     except TypeError as e:
         files = list(map(pathify, directory_or_filelist))
 
-    return files
\ No newline at end of file
+    return files
+
+def open_binary(fpth: typing.Union[Path, str], buffering: int = 1 << 20) -> typing.BinaryIO:
+    '''
+    opens a file for reading bytes with a large buffer, transparently decompressing
+    it if it is gzipped (by `.gz` extension)
+    '''
+    if str(fpth).endswith('.gz'):
+        import gzip
+        return gzip.open(fpth, 'rb')
+    return open(fpth, 'rb', buffering=buffering)
+
+
+def content_size(fpth: typing.Union[Path, str]) -> int:
+    '''
+    returns the number of bytes that reading a file (see `open_binary`) yields. for 
+    gzipped files this is read off the gzip trailer, which stores it modulo 2**32
+    '''
+    fpth = Path(fpth)
+    if fpth.suffix == '.gz':
+        with fpth.open('rb') as f:
+            f.seek(-4, 2)
+            return int.from_bytes(f.read(4), 'little')
+    return fpth.stat().st_size
+
+
+def count_lines(fpth: typing.Union[Path, str]) -> int:
+    '''
+    counts the lines of a file (see `open_binary`) by scanning it in large blocks.
+    uncompressed files are memory-mapped and scanned in place, without copying them
+    '''
+    if not str(fpth).endswith('.gz'):
+        with open(fpth, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0: # an empty file cannot be mapped
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                # look at the mapped bytes as an array so that comparing and counting run 
+                # in C, a block at a time to bound the size of the temporary mask
+                block = 1 << 24
+                n = sum(int(np.count_nonzero(np.frombuffer(m, np.uint8, min(block, size-i), i) == 10))
+                        for i in range(0, size, block))
+                # the final line may not be terminated by a newline
+                return n + (m[size-1] != 10)
+
+    n, last = 0, b'\n'
+    with open_binary(fpth) as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            n += block.count(b'\n')
+            last = block[-1:]
+    # the final line may not be terminated by a newline
+    return n + (last != b'\n')
+
+
+def prefetch(items: typing.Generator) -> typing.Generator:
+    '''
+    advances a generator in a background thread, one item ahead of the consumer, so that 
+    producing the next item (e.g., reading and parsing a file, which mostly releases the 
+    GIL) overlaps with processing the current one
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    done = object()
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(next, items, done)
+            while (item := future.result()) is not done:
+                future = executor.submit(next, items, done)
+                yield item
+    finally:
+        # only once the background thread is no longer advancing it
+        items.close()
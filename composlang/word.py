@@ -1,9 +1,17 @@
     
 # from dataclasses import dataclass
-# from collections import namedtuple
+from collections import namedtuple
+from sys import intern
 
 def Word(text, upos):
-    return text, upos
+    # interning lets the many occurrences of a token share a single string, so that 
+    # equality checks during dict lookups short-circuit on identity
+    return intern(text), intern(upos)
+
+# a batch of whole dependency-parsed sentences as parallel arrays over their tokens: 
+# integer id of each token's Word, index of its head within the batch (-1 for a root), 
+# upos, and deprel
+SentenceBatch = namedtuple('SentenceBatch', ['ids', 'heads', 'upos', 'deprel'])
 
 # @dataclass
 # class Word:
@@ -0,0 +1,81 @@
+
+import math
+
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.stats import entropy
+
+from composlang import composition
+from composlang.composition import CompositionAnalysis, sparse_entropy
+from composlang.corpus import Corpus
+
+
+@pytest.fixture(params=['numba', 'numpy'])
+def backend(request, monkeypatch):
+    if request.param == 'numba':
+        if composition.njit is None:
+            pytest.skip('numba is not installed')
+    else:
+        monkeypatch.setattr(composition, 'njit', None)
+    return request.param
+
+
+def counts() -> csr_matrix:
+    rng = np.random.default_rng(0)
+    dense = rng.integers(1, 5, size=(30, 20)) * (rng.random((30, 20)) < 0.3)
+    dense[5] = 0 # an empty row
+    dense[:, 7] = 0 # and an empty column
+    m = csr_matrix(dense.astype(np.float32))
+    m.data[:3] = 0 # explicitly stored zeros
+    return m
+
+
+@pytest.mark.parametrize('axis', [0, 1])
+@pytest.mark.parametrize('base', [None, 2])
+def test_sparse_entropy_matches_scipy(backend, axis, base):
+    m = counts()
+    # scipy gives nan for empty rows/columns, sparse_entropy gives 0
+    expected = np.nan_to_num(entropy(m.toarray(), axis=axis, base=base))
+    np.testing.assert_allclose(sparse_entropy(m, axis=axis, base=base), expected, atol=1e-6)
+    assert not np.isnan(expected[7 if axis == 0 else 5]) # was nan before nan_to_num
+
+
+@pytest.mark.parametrize('axis', [0, 1])
+def test_sparse_entropy_no_stored_values(backend, axis):
+    m = csr_matrix((3, 4), dtype=np.float32)
+    ent = sparse_entropy(m, axis=axis, base=2)
+    assert ent.dtype == np.float64
+    np.testing.assert_array_equal(ent, np.zeros(m.shape[1 - axis]))
+
+
+# ADJ -> NOUN (compound) -> NOUN, so each ADJ's grandparent is the second NOUN
+PHRASES = [('red', 'apple', 'pie'), ('red', 'pear', 'pie'),
+           ('green', 'apple', 'tart'), ('green', 'pear', 'pie')]
+
+
+def test_entropy_skip(tmp_path):
+    lines = []
+    for i, (adj, noun, head) in enumerate(PHRASES):
+        lines += [f'{i}\t{adj}\t{adj}\t1\t2\tADJ\tamod',
+                  f'{i}\t{noun}\t{noun}\t2\t3\tNOUN\tcompound',
+                  f'{i}\t{head}\t{head}\t3\t0\tNOUN\troot']
+    path = tmp_path / 'corpus.txt'
+    path.write_text('\n'.join(lines) + '\n')
+    corpus = Corpus(path, cache_dir=tmp_path / 'cache')
+    corpus.read(batch_size=2)
+
+    a = CompositionAnalysis(corpus, child_upos='ADJ', parent_upos='NOUN')
+    child = a.child_df.set_index('token')
+    parent = a.parent_df.set_index('token')
+
+    # entropy is over the parents of each ADJ, entropy_skip over its grandparents
+    assert child.loc['red', 'entropy'] == pytest.approx(math.log(2))
+    assert child.loc['red', 'entropy_skip'] == pytest.approx(0)
+    assert child.loc['green', 'entropy'] == pytest.approx(math.log(2))
+    assert child.loc['green', 'entropy_skip'] == pytest.approx(math.log(2))
+
+    assert parent.loc['apple', 'entropy'] == pytest.approx(math.log(2))
+    assert parent.loc['apple', 'entropy_skip'] == pytest.approx(0)
+    assert parent.loc['pie', 'entropy'] == pytest.approx(0)
+    assert parent.loc['pie', 'entropy_skip'] == pytest.approx(entropy([2, 1]))
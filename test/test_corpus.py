@@ -0,0 +1,126 @@
+
+from pathlib import Path
+
+import joblib
+import pytest
+from sqlitedict import SqliteDict
+
+from composlang.corpus import Corpus
+
+SAMPLE = Path(__file__).resolve().parent.parent / 'sample_data' / 'sample_parsed_coca.txt'
+N_SENTENCES = 6 # in the sample file
+
+
+def stats(c: Corpus) -> dict:
+    return dict(n=len(c), tokens=c.token_stats, pairs=c.pair_stats, skip_pairs=c.skip_pair_stats,
+                triplets=c.triplet_stats)
+
+
+def test_float_limit(tmp_path):
+    c = Corpus(SAMPLE, cache_dir=tmp_path, n_sentences=3.0)
+    c.read(batch_size=2)
+    assert len(c) == 3
+
+
+def test_infinite_limit(tmp_path):
+    # the CLI passes float('inf') when no limit is given
+    c = Corpus(SAMPLE, cache_dir=tmp_path, n_sentences=float('inf'))
+    c.read(batch_size=2)
+    assert len(c) == N_SENTENCES
+
+
+def test_rerun_at_limit(tmp_path):
+    for _ in range(2):
+        c = Corpus(SAMPLE, cache_dir=tmp_path, n_sentences=3)
+        c.read(batch_size=2)
+        assert len(c) == 3
+
+    # a lower limit than what was already processed reads nothing
+    c = Corpus(SAMPLE, cache_dir=tmp_path, n_sentences=2)
+    c.read(batch_size=2)
+    assert len(c) == 3
+
+
+def test_resume(tmp_path):
+    full = Corpus(SAMPLE, cache_dir=tmp_path / 'full')
+    full.read(batch_size=2)
+    assert len(full) == N_SENTENCES
+
+    Corpus(SAMPLE, cache_dir=tmp_path / 'resumed', n_sentences=3).read(batch_size=2)
+    resumed = Corpus(SAMPLE, cache_dir=tmp_path / 'resumed')
+    resumed.read(batch_size=2)
+    assert stats(resumed) == stats(full)
+
+
+def test_blank_line_fails(tmp_path):
+    # blank lines would otherwise be skipped by the parser but still counted when resuming
+    lines = SAMPLE.read_text().splitlines(keepends=True)
+    corpus = tmp_path / 'corpus.txt'
+    corpus.write_text(''.join(lines[:20] + ['\n'] + lines[20:]))
+    with pytest.raises(ValueError):
+        Corpus(corpus, cache_dir=tmp_path / 'cache').read(batch_size=2)
+
+
+def test_parallel_matches_sequential(tmp_path):
+    # split the sample into one file per sentence, at sentence_id changes
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    for line in SAMPLE.read_text().splitlines(keepends=True):
+        with open(corpus / f'{int(line.split()[0]):02d}.txt', 'a') as f:
+            f.write(line)
+
+    sequential = Corpus(corpus, cache_dir=tmp_path / 'sequential')
+    sequential.read(batch_size=2, parallel=False)
+    parallel = Corpus(corpus, cache_dir=tmp_path / 'parallel')
+    parallel.read(batch_size=2, parallel=True, checkpoint_every=4)
+    assert len(parallel._files) == N_SENTENCES
+    assert stats(parallel) == stats(sequential)
+    assert stats(Corpus(corpus, cache_dir=tmp_path / 'parallel')) == stats(sequential)
+
+
+def test_legacy_cache(tmp_path):
+    fresh = Corpus(SAMPLE, cache_dir=tmp_path / 'fresh')
+    fresh.read(batch_size=2)
+
+    # the state as earlier versions cached it: Counters of Words in an SqliteDict
+    cache = tmp_path / 'legacy' / 'coca'
+    cache.parent.mkdir()
+    with SqliteDict(str(cache), flag='c') as db:
+        db.update(_sentences_seen=fresh._sentences_seen, _lines_read=fresh._lines_read,
+                  _current_file=fresh._current_file, _token_stats=fresh.token_stats,
+                  _pair_stats=fresh.pair_stats, _skip_pair_stats=fresh.skip_pair_stats,
+                  _triplet_stats=fresh.triplet_stats, _files=fresh._files, _total=fresh._total,
+                  _n_sentences=None)
+        db.commit()
+
+    legacy = Corpus(SAMPLE, cache_dir=cache.parent, cache_tag=cache.name)
+    assert stats(legacy) == stats(fresh)
+
+    # resuming reads nothing new, but rewrites the cache in the current format
+    legacy.read(batch_size=2)
+    assert not cache.read_bytes().startswith(b'SQLite format 3')
+    state = joblib.load(cache)
+    assert '_token_stats' not in state and isinstance(state['_pair_counts'], tuple)
+    assert stats(Corpus(SAMPLE, cache_dir=cache.parent, cache_tag=cache.name)) == stats(fresh)
+
+
+@pytest.mark.parametrize('collapse_by_token', [True, False])
+@pytest.mark.parametrize('child_upos, parent_upos', [('*', '*'), ('DET', 'NOUN'), ('NOUN', 'VERB')])
+def test_top_k_combinations(tmp_path, child_upos, parent_upos, collapse_by_token):
+    c = Corpus(SAMPLE, cache_dir=tmp_path)
+    c.read(batch_size=2)
+
+    # totals per child and per parent, in the order in which they first occur among the pairs
+    children, parents = {}, {}
+    for child, parent, ct in c.iter_pair_counts(child_upos, parent_upos):
+        for totals, word in ((children, child), (parents, parent)):
+            totals[word] = totals.get(word, 0) + (1 if collapse_by_token else ct)
+
+    n_pairs = len(c.pair_stats)
+    # many tokens occur in a single pair, so most k fall within a run of tied totals
+    for k in (None, 0, 1, 2, 3, 5, 10, n_pairs, n_pairs + 1):
+        result = c.top_k_combinations(child_upos, parent_upos, k=k, collapse_by_token=collapse_by_token)
+        for (counts, labels), totals in zip((result[:2], result[2:]), (children, parents)):
+            # sorting is stable, so ties keep their order of first occurrence
+            expected = sorted(totals.items(), key=lambda item: -item[1])[:k]
+            assert list(zip(labels.tolist(), counts.tolist())) == expected
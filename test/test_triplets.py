@@ -1,7 +1,17 @@
 
+from pathlib import Path
+
+import pytest
+
 from composlang.corpus import Corpus
 
-with Corpus('COCA', cache_tag='test.db', n_sentences=1e3) as c:
-    c.read(batch_size=100, parallel=False)
+COCA = Path('COCA')
+
+
+@pytest.mark.skipif(not COCA.is_dir(), reason='needs the parsed COCA corpus in ./COCA')
+def test_triplets(tmp_path):
+    with Corpus(COCA, cache_dir=tmp_path, n_sentences=1e3) as c:
+        c.read(batch_size=100, parallel=False)
 
-print(c.triplet_stats)
+    print(c.triplet_stats)
+    assert c.triplet_stats